@@ -9,21 +9,61 @@ and the export file contains multiple disconnected trees.
 
 import json
 import argparse
+import mmap
+import os
 import sys
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser/encoder
+    orjson = None
 
-def load_conversations(filepath: Path) -> dict[str, dict[str, Any]]:
-    """Load conversations from a JSON file, indexed by conversation_id."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return {conv['conversation_id']: conv for conv in data}
+
+def read_json(filepath: Path) -> Any:
+    """Parse a JSON file, letting orjson read it straight from a memory map."""
+    with open(filepath, 'rb') as f:
+        # mmap can't map an empty file; let the parser report that instead
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return json.loads(f.read())
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):  # not available on Windows
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as buf:
+                try:
+                    return orjson.loads(buf)
+                except orjson.JSONDecodeError:
+                    pass
+
+        # orjson rejects some input the stdlib accepts (lone surrogate
+        # escapes, NaN), so retry with the more lenient parser
+        f.seek(0)
+        return json.loads(f.read())
+
+
+def load_conversations(filepath: Path) -> tuple[dict[str, dict[str, Any]], dict[str, int]]:
+    """
+    Load conversations from a JSON file, indexed by conversation_id.
+
+    Returns (conversations, sizes), where sizes maps each conversation_id
+    to its tree size so merging doesn't have to recount it.
+    """
+    data = read_json(filepath)
+
+    conversations = {}
+    sizes = {}
+    for conv in data:
+        cid = conv['conversation_id']
+        conversations[cid] = conv
+        sizes[cid] = get_conversation_size(conv)
+    return conversations, sizes
 
 
 def get_conversation_size(conv: dict[str, Any]) -> int:
     """Get the number of nodes in a conversation's mapping (tree size)."""
-    return len(conv.get('mapping', {}))
+    return len(conv.get('mapping') or ())
 
 
 def compare_forests(past: dict[str, dict], present: dict[str, dict]) -> dict:
@@ -34,8 +74,9 @@ def compare_forests(past: dict[str, dict], present: dict[str, dict]) -> dict:
     - missing_in_present: conversations in PAST but not in PRESENT
     - stats: summary statistics
     """
-    past_ids = set(past.keys())
-    present_ids = set(present.keys())
+    # Key views support set operations directly, without copying into sets
+    past_ids = past.keys()
+    present_ids = present.keys()
 
     missing_in_present = past_ids - present_ids
     missing_in_past = present_ids - past_ids
@@ -59,34 +100,27 @@ def compare_forests(past: dict[str, dict], present: dict[str, dict]) -> dict:
     }
 
 
-def merge_forests(past: dict[str, dict], present: dict[str, dict]) -> list[dict]:
+def merge_forests(past: dict[str, dict], present: dict[str, dict],
+                  past_sizes: dict[str, int], present_sizes: dict[str, int]) -> list[dict]:
     """
     Merge two forests, preferring the more complete version of each conversation.
 
     For each conversation:
     - If only in one file, include it
     - If in both, use the one with more nodes (more complete)
-    """
-    merged = {}
-    all_ids = set(past.keys()) | set(present.keys())
-
-    for conv_id in all_ids:
-        past_conv = past.get(conv_id)
-        present_conv = present.get(conv_id)
 
-        if past_conv is None:
+    Node counts come from the sizes dicts returned by load_conversations.
+    """
+    # Start from PAST, then let PRESENT add new conversations or replace
+    # strictly smaller ones (ties keep PAST)
+    merged = dict(past)
+    for conv_id, present_conv in present.items():
+        if past_sizes.get(conv_id, -1) < present_sizes[conv_id]:
             merged[conv_id] = present_conv
-        elif present_conv is None:
-            merged[conv_id] = past_conv
-        else:
-            # Both exist - use the larger one
-            past_size = get_conversation_size(past_conv)
-            present_size = get_conversation_size(present_conv)
-            merged[conv_id] = past_conv if past_size >= present_size else present_conv
 
     # Return as list, sorted by update_time (most recent first)
     result = list(merged.values())
-    result.sort(key=lambda x: x.get('update_time', 0), reverse=True)
+    result.sort(key=lambda c: c.get('update_time') or 0, reverse=True)
     return result
 
 
@@ -153,25 +187,32 @@ Examples:
 
     # Load files
     print(f"Loading {args.past}...")
-    past = load_conversations(Path(args.past))
+    past, past_sizes = load_conversations(Path(args.past))
     print(f"Loading {args.present}...")
-    present = load_conversations(Path(args.present))
+    present, present_sizes = load_conversations(Path(args.present))
 
     if args.command == 'compare':
         comparison = compare_forests(past, present)
         print_report(comparison, args.past, args.present)
 
         if args.json:
+            # The report is small; the stdlib encoder escapes everything to
+            # ASCII, so titles with lone surrogates still serialize
             with open(args.json, 'w', encoding='utf-8') as f:
                 json.dump(comparison, f, indent=2)
             print(f"\nDetailed report saved to: {args.json}")
 
     elif args.command == 'merge':
         print("Merging forests...")
-        merged = merge_forests(past, present)
+        merged = merge_forests(past, present, past_sizes, present_sizes)
 
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(merged, f, ensure_ascii=False)
+        if orjson:
+            # orjson emits UTF-8 bytes directly (no ASCII escaping, like ensure_ascii=False)
+            with open(args.output, 'wb') as f:
+                f.write(orjson.dumps(merged))
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
 
         print(f"Merged {len(merged)} conversations to: {args.output}")
 
@@ -5,24 +5,104 @@ Usage: python scan_content_types.py <path_to_conversations.json>
 """
 
 import json
+import reprlib
 import sys
 from collections import Counter
+from itertools import chain
 from pathlib import Path
 
+try:
+    import ijson
+except ImportError:  # fall back to loading the whole file
+    ijson = None
+
 
 # Keep this in sync with conversation_analyzer.pyw
 HANDLED_CONTENT_TYPES = {'text', 'multimodal_text', 'code'}
 HANDLED_PART_TYPES = {'image_asset_pointer', 'audio_asset_pointer'}
 
+# Bounded repr for samples, so large payloads (e.g. embedded base64) are
+# never stringified in full just to be cut down
+_sample_repr = reprlib.Repr()
+_sample_repr.maxstring = 400
+_sample_repr.maxother = 400
+_sample_repr.maxdict = 8
+_sample_repr.maxlist = 8
+
+
+def _iter_conversations(filepath: Path):
+    """Yield conversations one at a time, streaming with ijson when available."""
+    if ijson is None:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with open(filepath, 'rb') as f:
+        # use_float keeps timestamps as floats instead of Decimal
+        yield from ijson.items(f, 'item', use_float=True)
+
+
+def _iter_message_types(conv: dict):
+    """Yield (role, content_type, part_types) for each message in a conversation."""
+    for node in conv.get('mapping', {}).values():
+        msg = node.get('message')
+        if not msg:
+            continue
+
+        content = msg.get('content', {})
+        ct = content.get('content_type')
+        role = msg.get('author', {}).get('role')
+
+        # Nested parts only matter in multimodal_text
+        part_types = ()
+        if ct == 'multimodal_text':
+            part_types = [
+                pct for part in content.get('parts', [])
+                if isinstance(part, dict) and (pct := part.get('content_type'))
+            ]
+
+        yield role, ct, part_types
+
+
+def _collect_samples(conv: dict, results: dict):
+    """Record the first sample of each unhandled type found in a conversation."""
+    unhandled_samples = results['unhandled_samples']
+    unhandled_part_samples = results['unhandled_part_samples']
+
+    for node in conv.get('mapping', {}).values():
+        msg = node.get('message')
+        if not msg:
+            continue
+
+        content = msg.get('content', {})
+        ct = content.get('content_type')
+        if not ct:
+            continue
+
+        if ct not in HANDLED_CONTENT_TYPES and ct not in unhandled_samples:
+            unhandled_samples[ct] = {
+                'conversation': conv.get('title', 'Untitled'),
+                'keys': list(content.keys()),
+                'sample': _sample_repr.repr(content)
+            }
+
+        if ct == 'multimodal_text':
+            for part in content.get('parts', []):
+                if isinstance(part, dict):
+                    pct = part.get('content_type')
+                    if pct and pct not in HANDLED_PART_TYPES and pct not in unhandled_part_samples:
+                        unhandled_part_samples[pct] = {
+                            'conversation': conv.get('title', 'Untitled'),
+                            'keys': list(part.keys()),
+                            'sample': _sample_repr.repr(part)
+                        }
+
 
 def scan_file(filepath: Path) -> dict:
     """Scan a conversations.json and return analysis."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
     results = {
         'file': str(filepath),
-        'conversations': len(data),
+        'conversations': 0,
         'content_types': Counter(),
         'part_types': Counter(),  # nested in multimodal_text
         'author_roles': Counter(),
@@ -30,56 +110,44 @@ def scan_file(filepath: Path) -> dict:
         'unhandled_part_samples': {},
     }
 
-    for conv in data:
-        mapping = conv.get('mapping', {})
-        for node_id, node in mapping.items():
-            msg = node.get('message')
-            if not msg:
-                continue
-
-            # Author roles
-            role = msg.get('author', {}).get('role')
-            if role:
-                results['author_roles'][role] += 1
-
-            content = msg.get('content', {})
-            ct = content.get('content_type')
-            if not ct:
-                continue
-
-            results['content_types'][ct] += 1
-
-            # Save sample of unhandled types
-            if ct not in HANDLED_CONTENT_TYPES and ct not in results['unhandled_samples']:
-                results['unhandled_samples'][ct] = {
-                    'conversation': conv.get('title', 'Untitled'),
-                    'keys': list(content.keys()),
-                    'sample': _truncate(str(content), 400)
-                }
-
-            # Check nested parts in multimodal_text
-            if ct == 'multimodal_text':
-                parts = content.get('parts', [])
-                for part in parts:
-                    if isinstance(part, dict):
-                        pct = part.get('content_type')
-                        if pct:
-                            results['part_types'][pct] += 1
-
-                            if pct not in HANDLED_PART_TYPES and pct not in results['unhandled_part_samples']:
-                                results['unhandled_part_samples'][pct] = {
-                                    'conversation': conv.get('title', 'Untitled'),
-                                    'keys': list(part.keys()),
-                                    'sample': _truncate(str(part), 400)
-                                }
+    content_types = results['content_types']
+    part_types = results['part_types']
+    author_roles = results['author_roles']
+
+    # Conversations that introduced an unhandled type not seen before. Only
+    # these can hold its first sample, so samples are collected from them
+    # afterwards instead of checking every message.
+    seen_unhandled_types = set()
+    seen_unhandled_part_types = set()
+    flagged = []
+
+    for conv in _iter_conversations(filepath):
+        results['conversations'] += 1
+        rows = list(_iter_message_types(conv))
+        if not rows:
+            continue
+
+        roles, cts, pts = zip(*rows)
+        pts = list(chain.from_iterable(pts))
+
+        # Counter.update counts iterables in C
+        author_roles.update(filter(None, roles))
+        content_types.update(filter(None, cts))
+        part_types.update(pts)
+
+        new_types = set(filter(None, cts)) - HANDLED_CONTENT_TYPES - seen_unhandled_types
+        new_part_types = set(pts) - HANDLED_PART_TYPES - seen_unhandled_part_types
+        if new_types or new_part_types:
+            seen_unhandled_types |= new_types
+            seen_unhandled_part_types |= new_part_types
+            flagged.append(conv)
+
+    for conv in flagged:
+        _collect_samples(conv, results)
 
     return results
 
 
-def _truncate(s: str, length: int) -> str:
-    return s[:length] + '...' if len(s) > length else s
-
-
 def print_report(results: dict):
     """Print a formatted report."""
     print(f"\n{'='*60}")